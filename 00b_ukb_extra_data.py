@@ -27,14 +27,9 @@ extra_data: pl.DataFrame = (
         Path("data/ukb/ukb_initial_visit.csv"),
         null_values=["", " ", "NA"],
     )
-    .filter(
-        # We only include CRC patients from the survival data
-        # and those with complete platelet count
-        pl.Expr.and_(
-            col("eid").is_in(surv_data.get_column("eid")),
-            col("platelet_count").is_not_null(),
-        )
-    )
+    # We only include CRC patients from the survival data
+    # Patients without platelet count are kept for the multiple imputation
+    .filter(col("eid").is_in(surv_data.get_column("eid")))
     .with_columns(
         col("platelet_count_acquisition_time").str.slice(0, 10).str.to_date("%Y-%m-%d"),
         col("date_of_attending_assessment_centre").str.to_date("%Y-%m-%d"),
@@ -51,14 +46,20 @@ extra_data: pl.DataFrame = (
     )
     # We only include patients who are tested platelet count
     # within 7 days of attending the assessment centre
-    .filter((col("test_lag_days") >= 0) & (col("test_lag_days") < 7))
+    # or who are not tested platelet count
+    .filter(
+        pl.Expr.or_(
+            col("platelet_count").is_null(),
+            (col("test_lag_days") >= 0) & (col("test_lag_days") < 7),
+        )
+    )
     .with_columns([col(nm).replace_strict(value_maps[nm]) for nm in value_maps.keys()])
     .collect()
 )
 
 # %%
 # Merging the survival data and the extra data
-ukb_all_df: pl.DataFrame = (
+ukb_merged_df: pl.DataFrame = (
     surv_data.join(extra_data, on="eid", how="inner", validate="1:1")
     .with_columns(
         # Diagnostic lag time
@@ -80,6 +81,10 @@ ukb_all_df: pl.DataFrame = (
     )
 )
 
+# %%
+# We only include patients with complete platelet count in the main analysis
+ukb_all_df: pl.DataFrame = ukb_merged_df.filter(col("platelet_count").is_not_null())
+
 # %%
 # Selecting the columns of interest
 data_columns: list[str] = [
@@ -104,7 +109,11 @@ data_columns: list[str] = [
 
 ukb_df: pl.DataFrame = ukb_all_df.select(col(data_columns))
 
+# Data including patients without platelet count for the multiple imputation
+ukb_mi_df: pl.DataFrame = ukb_merged_df.select(col(data_columns))
+
 # %%
 # Saving the data
 ukb_all_df.write_csv(output_dir.joinpath("ukb_all_data.csv"))
 ukb_df.write_csv(output_dir.joinpath("ukb_data.csv"))
+ukb_mi_df.write_csv(output_dir.joinpath("ukb_mi_data.csv"))
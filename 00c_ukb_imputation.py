@@ -0,0 +1,66 @@
+# %%
+# Importing packages
+from pathlib import Path
+
+import polars as pl
+from polars import col
+
+from functions import mice, mice_complete
+
+# %%
+# Setting up the directory for the output
+output_dir: Path = Path("results/00")
+if not output_dir.exists():
+    output_dir.mkdir()
+
+# %%
+# Analysis data of CRC patients in UK Biobank
+# including patients without platelet count
+ukb_df: pl.DataFrame = pl.read_csv(
+    Path("results/00/ukb_mi_data.csv"),
+    null_values=["", " ", "NA"],
+)
+
+# %%
+# The imputation runs in worker processes which import this script,
+# so it only runs in the main process
+if __name__ == "__main__":
+    # Multiple imputation of the covariates in the Cox models
+    # The survival outcomes are used as predictors of the imputation models
+    ukb_cells: pl.DataFrame = mice(
+        ukb_df,
+        key="eid",
+        columns=[
+            "age_at_diagnosis",
+            "sex",
+            "body_mass_index",
+            "ethnic_background",
+            "smoking_status",
+            "alcohol_drinker_status",
+            "platelet_count",
+        ],
+        predictors=["diagnostic_lag_time"],
+        surv=[("os", "os_time"), ("css", "css_time")],
+        m=50,
+        seed=20250101,
+    ).with_columns(
+        # Platelet count > 300 and > 400 are derived from the imputed platelet count
+        col("platelet_count")
+        .cut([300], labels=["no", "yes"])
+        .cast(pl.String)
+        .alias("plt_300"),
+        col("platelet_count")
+        .cut([400], labels=["no", "yes"])
+        .cast(pl.String)
+        .alias("plt_400"),
+    )
+
+    # Logical check for the imputed data
+    ukb_imp_df: pl.DataFrame = mice_complete(ukb_df, ukb_cells, "eid", 1)
+    for nm in ukb_cells.columns[1:]:
+        if ukb_imp_df.get_column(nm).has_nulls():
+            raise ValueError(f"Missing values in {nm} after imputation")
+
+    # Saving the imputed cells
+    # Only individuals with missing values are saved for each imputation
+    ukb_cells.write_csv(output_dir.joinpath("ukb_imputed_cells.csv"))
@@ -47,14 +47,9 @@ extra_df: pl.DataFrame = (
         .replace({"na": None})
         .name.map(lambda x: name_dict[x])
     )
-    .filter(
-        # We only keep patients from survival data
-        # and patients with complete platelet count
-        pl.Expr.and_(
-            col("register").is_in(surv_df.get_column("register")),
-            col("platelet_count").is_not_null(),
-        )
-    )
+    # We only keep patients from survival data
+    # Patients without platelet count are kept for the multiple imputation
+    .filter(col("register").is_in(surv_df.get_column("register")))
     .with_columns(col("weight_kg", "height_cm", "platelet_count").cast(pl.Float64))
     .with_columns(
         # Body mass index calculation
@@ -79,13 +74,17 @@ extra_df: pl.DataFrame = (
 
 # %%
 # Merging the survival data and the extra data
-hx_full_df: pl.DataFrame = surv_df.join(
+hx_merged_df: pl.DataFrame = surv_df.join(
     extra_df,
     on="register",
     how="inner",
     validate="1:1",
 )
 
+# %%
+# We only include patients with complete platelet count in the main analysis
+hx_full_df: pl.DataFrame = hx_merged_df.filter(col("platelet_count").is_not_null())
+
 # %%
 # Selecting the columns of interest
 data_columns: list[str] = [
@@ -114,7 +113,11 @@ data_columns: list[str] = [
 
 hx_df: pl.DataFrame = hx_full_df.select(col(data_columns))
 
+# Data including patients without platelet count for the multiple imputation
+hx_mi_df: pl.DataFrame = hx_merged_df.select(col(data_columns))
+
 # %%
 # Saving the data
 hx_full_df.write_csv(output_dir.joinpath("hx_full_data.csv"))
 hx_df.write_csv(output_dir.joinpath("hx_data.csv"))
+hx_mi_df.write_csv(output_dir.joinpath("hx_mi_data.csv"))
@@ -0,0 +1,68 @@
+# %%
+# Importing packages
+from pathlib import Path
+
+import polars as pl
+from polars import col
+
+from functions import mice, mice_complete
+
+# %%
+# Setting up the directory for the output
+output_dir: Path = Path("results/01")
+if not output_dir.exists():
+    output_dir.mkdir()
+
+# %%
+# Analysis data of CRC patients in West China
+# including patients without platelet count
+# All patients are imputed, including those with missing survival outcomes,
+# so that the imputed datasets in 06 have no missing covariates
+hx_df: pl.DataFrame = pl.read_csv(
+    Path("results/01/hx_mi_data.csv"),
+    schema_overrides={"register": pl.String},
+)
+
+# %%
+# The imputation runs in worker processes which import this script,
+# so it only runs in the main process
+if __name__ == "__main__":
+    # Multiple imputation of the covariates in the Cox models
+    # The survival outcomes of all Cox models are used as predictors
+    # of the imputation models, DFS is missing for patients without surgery
+    hx_cells: pl.DataFrame = mice(
+        hx_df,
+        key="register",
+        columns=[
+            "age",
+            "sex",
+            "body_mass_index",
+            "smoking",
+            "alcohol",
+            "neo_adjuvant_therapy",
+            "platelet_count",
+        ],
+        surv=[("os", "os_time"), ("css", "css_time"), ("dfs", "dfs_time")],
+        m=50,
+        seed=20250101,
+    ).with_columns(
+        # Platelet count > 300 and > 400 are derived from the imputed platelet count
+        col("platelet_count")
+        .cut([300], labels=["no", "yes"])
+        .cast(pl.String)
+        .alias("plt_300"),
+        col("platelet_count")
+        .cut([400], labels=["no", "yes"])
+        .cast(pl.String)
+        .alias("plt_400"),
+    )
+
+    # Logical check for the imputed data
+    hx_imp_df: pl.DataFrame = mice_complete(hx_df, hx_cells, "register", 1)
+    for nm in hx_cells.columns[1:]:
+        if hx_imp_df.get_column(nm).has_nulls():
+            raise ValueError(f"Missing values in {nm} after imputation")
+
+    # Saving the imputed cells
+    # Only individuals with missing values are saved for each imputation
+    hx_cells.write_csv(output_dir.joinpath("hx_imputed_cells.csv"))
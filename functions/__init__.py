@@ -1,4 +1,15 @@
+from .discrimination import discrimination, discrimination_diff
+from .mice import mice, mice_complete
+from .split_episodes import split_episodes
 from .surv_expr import surv_expr
 from .value_maps import value_maps
 
-__all__ = ["surv_expr", "value_maps"]
+__all__ = [
+    "discrimination",
+    "discrimination_diff",
+    "mice",
+    "mice_complete",
+    "split_episodes",
+    "surv_expr",
+    "value_maps",
+]
@@ -0,0 +1,321 @@
+from math import erfc, sqrt
+
+import numpy as np
+import polars as pl
+
+
+def _sorted_run_sums(
+    group: np.ndarray,
+    block: np.ndarray,
+    weight: np.ndarray,
+) -> np.ndarray:
+    """
+    Sum of weights over the elements of the same group in strictly earlier
+    blocks, for elements already sorted by group and block.
+    """
+    idx: np.ndarray = np.arange(len(group))
+    # Exclusive cumulative sums read at the start of each run
+    cum: np.ndarray = np.cumsum(weight) - weight
+    new_group: np.ndarray = np.r_[True, group[1:] != group[:-1]]
+    new_run: np.ndarray = new_group | np.r_[True, block[1:] != block[:-1]]
+    run_start: np.ndarray = np.maximum.accumulate(np.where(new_run, idx, 0))
+    group_start: np.ndarray = np.maximum.accumulate(np.where(new_group, idx, 0))
+    return cum[run_start] - cum[group_start]
+
+
+def _count_before(
+    rank: np.ndarray,
+    block: np.ndarray,
+    weight: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For each element, sums the weights of the elements in strictly earlier
+    blocks with a lower rank and with the same rank.
+
+    This is the dominance counting of a Fenwick tree over the ranks, done for
+    all elements at once with one pass per bit of the rank (a wavelet matrix),
+    so that the cost is O(n log n) without a Python loop over the elements.
+    """
+    n: int = len(rank)
+    idx: np.ndarray = np.arange(n)
+    # The elements are kept sorted by the higher bits of the rank and the block
+    order: np.ndarray = np.argsort(block, kind="stable")
+    r: np.ndarray = rank[order]
+    blk: np.ndarray = block[order]
+    w: np.ndarray = weight[order]
+    less: np.ndarray = np.zeros(n)
+    for b in reversed(range(max(int(rank.max()).bit_length(), 1))):
+        high: np.ndarray = r >> (b + 1)
+        zero: np.ndarray = 1 - ((r >> b) & 1)
+        # Within the same higher bits, elements with bit b set are greater than
+        # all the elements with bit b unset
+        less += (1 - zero) * _sorted_run_sums(high, blk, w * zero)
+        # Stable partition by bit b within the same higher bits
+        new_group: np.ndarray = np.r_[True, high[1:] != high[:-1]]
+        group_id: np.ndarray = np.cumsum(new_group) - 1
+        group_start: np.ndarray = np.flatnonzero(new_group)[group_id]
+        n_zero: np.ndarray = np.bincount(group_id, weights=zero).astype(np.int64)
+        cum_zero: np.ndarray = np.cumsum(zero) - zero
+        zeros_before: np.ndarray = cum_zero - cum_zero[group_start]
+        pos: np.ndarray = group_start + np.where(
+            zero == 1,
+            zeros_before,
+            n_zero[group_id] + (idx - group_start) - zeros_before,
+        )
+        for arr in (order, r, blk, w, less):
+            arr[pos] = arr.copy()
+    equal: np.ndarray = _sorted_run_sums(r, blk, w)
+    out_less: np.ndarray = np.empty(n)
+    out_equal: np.ndarray = np.empty(n)
+    out_less[order] = less
+    out_equal[order] = equal
+    return out_less, out_equal
+
+
+def _total_before(block: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """
+    For each element, sums the weights of the elements in strictly earlier blocks.
+    """
+    order: np.ndarray = np.argsort(block, kind="stable")
+    out: np.ndarray = np.empty(len(block))
+    out[order] = _sorted_run_sums(
+        np.zeros(len(block), dtype=np.int64), block[order], weight[order]
+    )
+    return out
+
+
+def _pair_terms(
+    rank: np.ndarray,
+    block: np.ndarray,
+    weight: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-individual sums of the concordant and comparable pair weights.
+
+    A pair (i, j) is comparable when `block[j] < block[i]`, with pair weight
+    `weight[i]`, and concordant when `rank[i] > rank[j]` (ties count 1/2).
+    """
+    ones: np.ndarray = np.ones(len(rank))
+    # i as the individual with the earlier event
+    less, equal = _count_before(rank, block, ones)
+    comparable: np.ndarray = _total_before(block, ones)
+    # j as the individual still at risk
+    greater, equal_j = _count_before(rank.max() - rank, -block, weight)
+    return (
+        weight * (less + 0.5 * equal) + greater + 0.5 * equal_j,
+        weight * comparable + _total_before(-block, weight),
+    )
+
+
+def _censoring_km(event: np.ndarray, time: np.ndarray) -> np.ndarray:
+    """
+    Kaplan-Meier estimate of the censoring distribution G(t-) at each time.
+    """
+    _, inverse, counts = np.unique(time, return_inverse=True, return_counts=True)
+    n_censor: np.ndarray = np.bincount(inverse, weights=1 - event)
+    n_risk: np.ndarray = len(time) - np.r_[0, np.cumsum(counts)[:-1]]
+    surv: np.ndarray = np.r_[1.0, np.cumprod(1 - n_censor / n_risk)[:-1]]
+    return surv[inverse]
+
+
+def _influence(
+    data: pl.DataFrame,
+    event: str,
+    time: str,
+    scores: list[str],
+    horizons: tuple[int | float, ...],
+    tau: float | None,
+) -> list[tuple[str, int | float | None, np.ndarray, np.ndarray]]:
+    """
+    Estimates and influence terms of all metrics for all risk scores.
+
+    The variance of a metric is the sum of squares of its influence terms,
+    and the covariance of two metrics is the sum of their cross-products.
+    """
+    # NaN scores would be ranked above all other scores, so they are treated
+    # as missing values
+    df: pl.DataFrame = data.select(event, time, *scores).fill_nan(None).drop_nulls()
+    d: np.ndarray = df.get_column(event).cast(pl.Float64).to_numpy()
+    t: np.ndarray = df.get_column(time).cast(pl.Float64).to_numpy()
+    ranks: list[np.ndarray] = [
+        np.unique(df.get_column(nm).to_numpy(), return_inverse=True)[1] for nm in scores
+    ]
+    g: np.ndarray = _censoring_km(d, t)
+
+    if not d.any():
+        raise ValueError("No events in the data")
+    time_block: np.ndarray = np.unique(-t, return_inverse=True)[1]
+    designs: dict[str, tuple[np.ndarray, np.ndarray]] = {
+        # Individuals are blocked by descending time, censored before events,
+        # so that censored individuals at the time of an event are at risk
+        # while tied events are not comparable
+        "harrell_c": (2 * time_block + d.astype(np.int64), d),
+        # Uno's C-index only compares individuals with strictly longer time,
+        # so all individuals with the same time share a block
+        "uno_c": (
+            time_block,
+            d * (t < (tau if tau is not None else np.inf)) / g**2,
+        ),
+    }
+
+    out: list[tuple[str, int | float | None, np.ndarray, np.ndarray]] = []
+    for metric, (block, w) in designs.items():
+        est: list[float] = []
+        infl: list[np.ndarray] = []
+        for r in ranks:
+            concordant, comparable = _pair_terms(r, block, w)
+            if comparable.sum() == 0:
+                raise ValueError(f"No comparable pairs for {metric}")
+            c: float = concordant.sum() / comparable.sum()
+            est.append(c)
+            infl.append(2 * (concordant - c * comparable) / comparable.sum())
+        out.append((metric, None, np.array(est), np.column_stack(infl)))
+
+    # Cumulative/dynamic AUC with cases weighted by the inverse probability
+    # of censoring and controls still event-free after the horizon
+    for yr in horizons:
+        case: np.ndarray = (t <= yr * 365.25) & (d == 1)
+        keep: np.ndarray = case | (t > yr * 365.25)
+        if not case.any() or case[keep].all():
+            raise ValueError(f"No cases or no controls at the horizon of {yr} years")
+        est = []
+        infl = []
+        for r in ranks:
+            concordant, comparable = _pair_terms(
+                r[keep], case[keep].astype(np.int64), case[keep] / g[keep]
+            )
+            auc: float = concordant.sum() / comparable.sum()
+            est.append(auc)
+            full: np.ndarray = np.zeros(len(t))
+            full[keep] = 2 * (concordant - auc * comparable) / comparable.sum()
+            infl.append(full)
+        out.append(("auc", yr, np.array(est), np.column_stack(infl)))
+
+    return out
+
+
+def discrimination(
+    data: pl.DataFrame,
+    event: str,
+    time: str,
+    scores: list[str],
+    horizons: tuple[int | float, ...] = (1, 3, 5),
+    tau: float | None = None,
+) -> pl.DataFrame:
+    """
+    Computes the discrimination metrics of risk scores for a survival outcome:
+    Harrell's C-index, Uno's C-index and the cumulative/dynamic time-dependent
+    AUC at the given horizons.
+
+    All metrics are computed by sorting in O(n log n). In Harrell's C-index,
+    individuals censored at the time of an event are comparable with it,
+    while Uno's C-index only compares individuals with strictly longer time.
+    Uno's C-index and the AUC are weighted by the inverse probability of
+    censoring (IPCW) from the Kaplan-Meier estimate of the censoring
+    distribution. The standard errors are from the influence function of the
+    U-statistics, treating the IPCW weights as fixed.
+
+    Parameters
+    ----------
+    data
+        The data frame including the survival outcome and the risk scores.
+        Individuals with missing values (NULL or NaN) in any of these columns
+        are excluded.
+    event
+        Column name of the survival indicator (e.g., "os").
+    time
+        Column name of the time to follow-up with unit day (e.g., "os_time").
+    scores
+        Column names of the risk scores. Higher scores mean higher risk.
+    horizons
+        The time horizons in years for the time-dependent AUC. An error is
+        raised if a horizon has no cases or no controls.
+    tau
+        The truncation time with unit day for Uno's C-index. Default is no
+        truncation. An error is raised if no pairs are comparable before it.
+
+    Returns
+    -------
+    polars.DataFrame
+        A data frame with columns "metric" ("harrell_c", "uno_c" or "auc"),
+        "horizon" (NULL for the C-indices), "score", "estimate" and "se".
+    """
+    return pl.concat(
+        [
+            pl.DataFrame(
+                {
+                    "metric": metric,
+                    "horizon": pl.Series([yr] * len(scores), dtype=pl.Float64),
+                    "score": scores,
+                    "estimate": est,
+                    "se": np.sqrt(np.sum(infl**2, axis=0)),
+                }
+            )
+            for metric, yr, est, infl in _influence(
+                data, event, time, scores, horizons, tau
+            )
+        ],
+        how="vertical",
+    )
+
+
+def discrimination_diff(
+    data: pl.DataFrame,
+    event: str,
+    time: str,
+    scores: list[str],
+    reference: str,
+    horizons: tuple[int | float, ...] = (1, 3, 5),
+    tau: float | None = None,
+) -> pl.DataFrame:
+    """
+    Compares the discrimination metrics of risk scores with a reference score
+    on the same individuals, accounting for the correlation between them.
+
+    Parameters
+    ----------
+    data
+        The data frame including the survival outcome and the risk scores.
+    event
+        Column name of the survival indicator (e.g., "os").
+    time
+        Column name of the time to follow-up with unit day (e.g., "os_time").
+    scores
+        Column names of the risk scores to be compared with `reference`.
+    reference
+        Column name of the reference risk score, e.g., the linear predictor of
+        the model without platelet count.
+    horizons
+        The time horizons in years for the time-dependent AUC.
+    tau
+        The truncation time with unit day for Uno's C-index.
+
+    Returns
+    -------
+    polars.DataFrame
+        A data frame with columns "metric", "horizon", "score", "reference",
+        "diff" (the metric of score minus that of reference), "se" and
+        "p_value" (two-sided Wald test).
+    """
+    others: list[str] = [nm for nm in scores if nm != reference]
+    frames: list[pl.DataFrame] = []
+    for metric, yr, est, infl in _influence(
+        data, event, time, [reference, *others], horizons, tau
+    ):
+        diff: np.ndarray = est[1:] - est[0]
+        se: np.ndarray = np.sqrt(np.sum((infl[:, 1:] - infl[:, [0]]) ** 2, axis=0))
+        p_value: list[float] = [erfc(abs(z) / sqrt(2)) for z in diff / se]
+        frames.append(
+            pl.DataFrame(
+                {
+                    "metric": metric,
+                    "horizon": pl.Series([yr] * len(others), dtype=pl.Float64),
+                    "score": others,
+                    "reference": reference,
+                    "diff": diff,
+                    "se": se,
+                    "p_value": p_value,
+                }
+            )
+        )
+    return pl.concat(frames, how="vertical")
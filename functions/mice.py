@@ -0,0 +1,405 @@
+import multiprocessing as mp
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+from polars import col
+
+# Variables shared with the worker processes
+# They are passed once to each worker by the pool initializer
+_shared: dict[str, object] = {}
+
+
+def _nelson_aalen(event: np.ndarray, time: np.ndarray) -> np.ndarray:
+    """
+    Nelson-Aalen cumulative hazard evaluated at each individual's own time.
+    """
+    order: np.ndarray = np.argsort(time, kind="stable")
+    t_sorted: np.ndarray = time[order]
+    d_sorted: np.ndarray = event[order]
+    uniq, first = np.unique(t_sorted, return_index=True)
+    n_event: np.ndarray = np.add.reduceat(d_sorted, first)
+    n_risk: np.ndarray = len(time) - first
+    cumhaz: np.ndarray = np.cumsum(n_event / n_risk)
+    return cumhaz[np.searchsorted(uniq, time)]
+
+
+def _design(
+    values: list[np.ndarray],
+    kinds: list[int],
+    aux: np.ndarray,
+    exclude: int,
+) -> np.ndarray:
+    """
+    Builds the design matrix from all variables except the imputation target.
+
+    Numeric variables (kind 0) are standardized, categorical variables
+    (kind = number of levels) are one-hot encoded against the first level.
+    """
+    blocks: list[np.ndarray] = [np.ones((aux.shape[0], 1)), aux]
+    for j, (v, k) in enumerate(zip(values, kinds)):
+        if j == exclude:
+            continue
+        if k == 0:
+            blocks.append(((v - v.mean()) / (v.std() or 1.0))[:, None])
+        else:
+            blocks.append((v[:, None] == np.arange(1, k)).astype(np.float64))
+    return np.hstack(blocks)
+
+
+def _draw_numeric(
+    x_obs: np.ndarray,
+    y_obs: np.ndarray,
+    x_mis: np.ndarray,
+    donors: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Predictive mean matching on a Bayesian linear regression draw.
+    """
+    n, p = x_obs.shape
+    xtx: np.ndarray = x_obs.T @ x_obs
+    xtx[np.diag_indices(p)] *= 1 + 1e-5
+    v: np.ndarray = np.linalg.inv(xtx)
+    beta: np.ndarray = v @ (x_obs.T @ y_obs)
+    rss: float = float(np.sum((y_obs - x_obs @ beta) ** 2))
+    sigma: float = np.sqrt(rss / rng.chisquare(max(n - p, 1)))
+    beta_star: np.ndarray = beta + sigma * (
+        np.linalg.cholesky((v + v.T) / 2) @ rng.standard_normal(p)
+    )
+    # Donors are the observed cases whose predicted means are nearest
+    # The candidates are searched in a sorted window instead of a full distance matrix
+    yhat_obs: np.ndarray = x_obs @ beta
+    yhat_mis: np.ndarray = x_mis @ beta_star
+    order: np.ndarray = np.argsort(yhat_obs)
+    yhat_sorted: np.ndarray = yhat_obs[order]
+    donors = min(donors, n)
+    pos: np.ndarray = np.searchsorted(yhat_sorted, yhat_mis)
+    # The window is shifted inwards at both ends of the sorted predictions
+    # so that it always holds 2 * donors distinct candidates
+    width: int = min(2 * donors, n)
+    window: np.ndarray = np.clip(pos - donors, 0, n - width)[:, None] + np.arange(width)
+    dist: np.ndarray = np.abs(yhat_sorted[window] - yhat_mis[:, None])
+    nearest: np.ndarray = np.argpartition(dist, donors - 1, axis=1)[:, :donors]
+    pick: np.ndarray = nearest[
+        np.arange(len(yhat_mis)), rng.integers(donors, size=len(yhat_mis))
+    ]
+    return y_obs[order[window[np.arange(len(yhat_mis)), pick]]]
+
+
+def _draw_categorical(
+    x_obs: np.ndarray,
+    y_obs: np.ndarray,
+    x_mis: np.ndarray,
+    k: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Draws categories from a multinomial logistic regression with parameters
+    drawn from their approximate posterior.
+    """
+    n, p = x_obs.shape
+    y_hot: np.ndarray = (y_obs[:, None] == np.arange(1, k)).astype(np.float64)
+    beta: np.ndarray = np.zeros((p, k - 1))
+    # The ridge penalty is scaled to the sample size, so that it keeps the
+    # coefficients finite under separation, e.g., with rare categories
+    ridge: np.ndarray = 1e-4 * n * np.eye(p * (k - 1))
+
+    def _prob(x: np.ndarray, b: np.ndarray) -> np.ndarray:
+        eta: np.ndarray = np.hstack([np.zeros((x.shape[0], 1)), x @ b])
+        eta -= eta.max(axis=1, keepdims=True)
+        prob: np.ndarray = np.exp(eta)
+        return prob / prob.sum(axis=1, keepdims=True)
+
+    # Newton-Raphson with the ridge penalty
+    for _ in range(50):
+        prob: np.ndarray = _prob(x_obs, beta)[:, 1:]
+        grad: np.ndarray = (x_obs.T @ (y_hot - prob)).T.ravel() - ridge @ beta.T.ravel()
+        # Fisher information in (k - 1) x (k - 1) blocks of size p x p
+        info: np.ndarray = ridge.copy()
+        for a in range(k - 1):
+            for b in range(a, k - 1):
+                w: np.ndarray = prob[:, a] * ((a == b) - prob[:, b])
+                block: np.ndarray = (x_obs * w[:, None]).T @ x_obs
+                info[a * p : (a + 1) * p, b * p : (b + 1) * p] += block
+                if a != b:
+                    info[b * p : (b + 1) * p, a * p : (a + 1) * p] += block
+        step: np.ndarray = np.linalg.solve(info, grad)
+        beta += step.reshape(k - 1, p).T
+        if np.max(np.abs(step)) < 1e-8:
+            break
+    else:
+        warnings.warn(
+            "Logistic regression of the imputation model did not converge",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+
+    cov: np.ndarray = np.linalg.inv(info)
+    delta: np.ndarray = np.linalg.cholesky((cov + cov.T) / 2) @ rng.standard_normal(
+        p * (k - 1)
+    )
+    beta_star: np.ndarray = beta + delta.reshape(k - 1, p).T
+    cum: np.ndarray = np.cumsum(_prob(x_mis, beta_star), axis=1)
+    u: np.ndarray = rng.random(x_mis.shape[0]) * cum[:, -1]
+    return (u[:, None] > cum).sum(axis=1).astype(np.float64)
+
+
+def _init_worker(
+    values: list[np.ndarray],
+    missing: list[np.ndarray],
+    kinds: list[int],
+    aux: np.ndarray,
+) -> None:
+    _shared.update(values=values, missing=missing, kinds=kinds, aux=aux)
+
+
+def _impute_one(
+    seed: np.random.SeedSequence,
+    n_iter: int,
+    donors: int,
+) -> list[np.ndarray]:
+    """
+    Runs one chain of chained equations and returns only the imputed cells.
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    kinds: list[int] = _shared["kinds"]
+    missing: list[np.ndarray] = _shared["missing"]
+    aux: np.ndarray = _shared["aux"]
+    values: list[np.ndarray] = [v.copy() for v in _shared["values"]]
+    targets: list[int] = [j for j, m in enumerate(missing) if m.any()]
+
+    # Starting values are random draws from the observed values
+    for j in targets:
+        values[j][missing[j]] = rng.choice(
+            values[j][~missing[j]], size=missing[j].sum()
+        )
+
+    for _ in range(n_iter):
+        for j in targets:
+            x: np.ndarray = _design(values, kinds, aux, exclude=j)
+            y_obs: np.ndarray = values[j][~missing[j]]
+            if kinds[j] == 0:
+                values[j][missing[j]] = _draw_numeric(
+                    x[~missing[j]], y_obs, x[missing[j]], donors, rng
+                )
+            else:
+                values[j][missing[j]] = _draw_categorical(
+                    x[~missing[j]], y_obs.astype(np.int64), x[missing[j]], kinds[j], rng
+                )
+
+    return [values[j][missing[j]] for j in range(len(values))]
+
+
+def mice(
+    data: pl.DataFrame,
+    key: str,
+    columns: list[str],
+    predictors: list[str] | None = None,
+    surv: list[tuple[str, str]] | None = None,
+    m: int = 20,
+    n_iter: int = 10,
+    donors: int = 5,
+    seed: int | None = None,
+    n_workers: int | None = None,
+) -> pl.DataFrame:
+    """
+    Multiple imputation by chained equations (MICE) with the imputed datasets
+    generated in parallel worker processes.
+
+    Numeric variables are imputed by predictive mean matching and categorical
+    variables by (multinomial) logistic regression, both with parameters drawn
+    from their posterior. Each variable is imputed from all other variables
+    in `columns`, `predictors` and the survival outcomes.
+
+    Parameters
+    ----------
+    data
+        The data frame to be imputed.
+    key
+        Column name of the unique identifier of each individual (e.g., "eid").
+    columns
+        Column names of the variables to be imputed. Variables without missing
+        values are only used as predictors.
+    predictors
+        Column names of complete auxiliary variables used only as predictors.
+    surv
+        Pairs of survival indicator and time column names (e.g., ("os", "os_time")).
+        The indicator and the Nelson-Aalen cumulative hazard are used as
+        predictors, as recommended for imputation before Cox regression.
+        Individuals with a missing survival outcome (e.g., DFS of patients
+        without surgery) have both set to zero, and an indicator of the
+        missing outcome is added as a predictor.
+    m
+        The number of imputed datasets.
+    n_iter
+        The number of iterations of each chain.
+    donors
+        The number of donors for predictive mean matching.
+    seed
+        Seed of the random number generator.
+    n_workers
+        The number of worker processes. Default is the number of CPUs. The
+        workers are started by "forkserver" or "spawn" and import the calling
+        script, so scripts must call this function under
+        `if __name__ == "__main__":`.
+
+    Returns
+    -------
+    polars.DataFrame
+        The imputed cells in long format, with column ".imp" (1 to `m`), `key`
+        and `columns`. Only individuals with at least one missing value are
+        included. Use `mice_complete` to obtain an imputed dataset.
+    """
+    if data.get_column(key).is_duplicated().any():
+        raise ValueError(f"Duplicated values in the key column {key}")
+
+    aux_columns: list[pl.Series] = [data.get_column(nm) for nm in predictors or []]
+    for event, time in surv or []:
+        # The cumulative hazard is estimated among individuals with the outcome
+        observed: np.ndarray = (
+            data.select(col(event).is_not_null() & col(time).is_not_null())
+            .to_series()
+            .to_numpy()
+        )
+        d: np.ndarray = np.zeros(data.height)
+        cumhaz: np.ndarray = np.zeros(data.height)
+        d[observed] = data.get_column(event).to_numpy()[observed]
+        cumhaz[observed] = _nelson_aalen(
+            d[observed], data.get_column(time).to_numpy()[observed].astype(np.float64)
+        )
+        aux_columns.append(pl.Series(event, d))
+        aux_columns.append(pl.Series(f"{event}_cumhaz", cumhaz))
+        if not observed.all():
+            aux_columns.append(
+                pl.Series(f"{event}_missing", (~observed).astype(np.float64))
+            )
+    for s in aux_columns:
+        if s.null_count() > 0 or (s.dtype.is_float() and s.is_nan().any()):
+            raise ValueError(f"Missing values in the predictor {s.name}")
+    aux: np.ndarray = np.column_stack(
+        [
+            s.to_physical().cast(pl.Float64).to_numpy()
+            if s.dtype.is_numeric()
+            else s.to_dummies(drop_first=True).to_numpy().astype(np.float64)
+            for s in aux_columns
+        ]
+        or [np.empty((data.height, 0))]
+    )
+    aux = (aux - aux.mean(axis=0)) / np.where(aux.std(axis=0) > 0, aux.std(axis=0), 1)
+
+    # Numeric variables are kept as is
+    # Categorical variables are encoded as level codes starting from 0
+    values: list[np.ndarray] = []
+    missing: list[np.ndarray] = []
+    kinds: list[int] = []
+    levels: list[pl.Series | None] = []
+    for nm in columns:
+        s: pl.Series = data.get_column(nm)
+        missing.append(s.is_null().to_numpy())
+        if s.dtype.is_numeric():
+            values.append(s.cast(pl.Float64).to_numpy().copy())
+            kinds.append(0)
+            levels.append(None)
+        else:
+            s = s.cast(pl.String)
+            lv: pl.Series = s.drop_nulls().unique().sort()
+            values.append(
+                s.replace_strict(lv, pl.int_range(lv.len(), eager=True), default=None)
+                .cast(pl.Float64)
+                .to_numpy()
+                .copy()
+            )
+            kinds.append(lv.len())
+            levels.append(lv)
+
+    with ProcessPoolExecutor(
+        max_workers=min(n_workers or os.cpu_count() or 1, m),
+        # Forking is unsafe with the threads of polars, and the "spawn" and
+        # "forkserver" workers import the calling script, which must therefore
+        # call this function under `if __name__ == "__main__":`
+        mp_context=mp.get_context(
+            "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ),
+        initializer=_init_worker,
+        initargs=(values, missing, kinds, aux),
+    ) as executor:
+        imputed: list[list[np.ndarray]] = list(
+            executor.map(
+                _impute_one,
+                np.random.SeedSequence(seed).spawn(m),
+                [n_iter] * m,
+                [donors] * m,
+            )
+        )
+
+    # Only individuals with at least one missing value are kept
+    rows: np.ndarray = np.flatnonzero(np.logical_or.reduce(missing))
+    frames: list[pl.DataFrame] = []
+    for i, cells in enumerate(imputed):
+        filled: dict[str, pl.Series] = {}
+        for nm, v, mis, cell, lv in zip(columns, values, missing, cells, levels):
+            v = v.copy()
+            v[mis] = cell
+            v = v[rows]
+            dtype: pl.DataType = data.schema[nm]
+            filled[nm] = (
+                pl.Series(nm, v).cast(dtype)
+                if lv is None
+                else lv.gather(v.astype(np.int64)).cast(dtype).alias(nm)
+            )
+        frames.append(
+            pl.DataFrame(
+                [
+                    pl.Series(".imp", np.full(len(rows), i + 1, dtype=np.int32)),
+                    data.get_column(key).gather(rows),
+                    *filled.values(),
+                ]
+            )
+        )
+    return pl.concat(frames, how="vertical")
+
+
+def mice_complete(
+    data: pl.DataFrame, cells: pl.DataFrame, key: str, imp: int
+) -> pl.DataFrame:
+    """
+    Creates the imputed dataset from the original data and the imputed cells.
+
+    Only the imputed columns are rewritten, the other columns are shared with
+    the original data frame without copying.
+
+    Parameters
+    ----------
+    data
+        The original data frame with missing values.
+    cells
+        The imputed cells returned by `mice`.
+    key
+        Column name of the unique identifier of each individual.
+    imp
+        The index of the imputed dataset, from 1 to the number of imputations.
+
+    Returns
+    -------
+    polars.DataFrame
+        The imputed dataset with the same rows and columns as `data`.
+    """
+    part: pl.DataFrame = cells.filter(col(".imp") == imp).drop(".imp")
+    if part.is_empty():
+        return data
+    rows: pl.Series = (
+        data.select(key)
+        .with_row_index("row")
+        .join(part.select(key), on=key, how="inner", maintain_order="right")
+        .get_column("row")
+    )
+    if rows.len() != part.height:
+        raise ValueError("Keys of imputed cells are not found in the data")
+    return data.with_columns(
+        data.get_column(nm).clone().scatter(rows, part.get_column(nm))
+        for nm in part.columns
+        if nm != key
+    )
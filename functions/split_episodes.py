@@ -0,0 +1,146 @@
+import polars as pl
+from polars import col, lit, when
+
+
+def split_episodes(
+    data: pl.LazyFrame,
+    key: str,
+    start: str,
+    stop: str,
+    event: str,
+    covariates: list[pl.LazyFrame],
+    date: str = "date",
+) -> pl.LazyFrame:
+    """
+    Splits the follow-up of each individual into (start, stop] episodes at the
+    dates when the time-varying covariates change, i.e., the counting process
+    format for Cox regression with time-varying covariates.
+
+    All steps are sorts and sorted merges (as-of joins) over the whole table,
+    without a loop over individuals. Times are stored as Int32 day offsets
+    from the start date, the event as Int8, and string covariates as
+    categoricals to keep the long table compact.
+
+    Parameters
+    ----------
+    data
+        One row per individual with the key, the start and stop dates of the
+        follow-up, and the event indicator at the stop date.
+    key
+        Column name of the unique identifier of each individual (e.g., "eid").
+    start
+        Column name of the start date of the follow-up (e.g., "date_crc_diagnosis").
+    stop
+        Column name of the stop date of the follow-up (e.g., "date_last_fu").
+    event
+        Column name of the event indicator (e.g., "os").
+    covariates
+        Long tables of time-varying covariates, each with the key, the date
+        column and the covariate columns, e.g., repeat blood counts or the
+        recurrence and metastasis dates coded as "yes" from that date on.
+        A value holds from its date until the next value of the same table,
+        and a value equal to the previous one does not start a new episode.
+        Values dated on or before the start date are baseline values, and
+        values dated on or after the stop date are ignored.
+    date
+        Column name of the measurement dates in `covariates`.
+
+    Returns
+    -------
+    polars.LazyFrame
+        One row per episode with columns `key`, "start", "stop", "event" and
+        the covariate columns, sorted by `key` and "start". The event is 1
+        only in the last episode of an individual with the event. Individuals
+        with follow-up time of zero days are excluded because the episodes
+        must have positive length.
+    """
+    persons: pl.LazyFrame = data.select(
+        col(key),
+        col(start).alias("_origin"),
+        col(stop).sub(col(start)).dt.total_days().cast(pl.Int32).alias("_stop"),
+        col(event).cast(pl.Int8).alias("_event"),
+    ).filter(col("_stop") > 0)
+
+    # Measurement dates as day offsets from the start of follow-up
+    changes: list[pl.LazyFrame] = []
+    for cov in covariates:
+        values: list[str] = [
+            nm for nm in cov.collect_schema().names() if nm not in (key, date)
+        ]
+        changes.append(
+            cov.with_row_index("_row")
+            .join(persons.select(key, "_origin", "_stop"), on=key, how="inner")
+            .with_columns(
+                col(date)
+                .sub(col("_origin"))
+                .dt.total_days()
+                .cast(pl.Int32)
+                .alias("_day")
+            )
+            .filter(col("_day") < col("_stop"))
+            .sort(key, "_day", "_row")
+            # We only keep the last measurement of each day
+            .unique(subset=[key, "_day"], keep="last", maintain_order=True)
+            # A measurement equal to the previous one of the same individual
+            # (missing before the first one) does not change the covariates
+            .filter(
+                ~pl.all_horizontal(
+                    col(nm).eq_missing(
+                        when(col(key) == col(key).shift(1)).then(col(nm).shift(1))
+                    )
+                    for nm in values
+                )
+            )
+            .drop(date, "_origin", "_stop", "_row")
+        )
+
+    # Episodes start at day 0 and at each day within the follow-up
+    # when any covariate changes
+    episodes: pl.LazyFrame = (
+        pl.concat(
+            [
+                persons.select(key, lit(0, dtype=pl.Int32).alias("start")),
+                *[
+                    ch.filter(col("_day") > 0).select(key, col("_day").alias("start"))
+                    for ch in changes
+                ],
+            ],
+            how="vertical",
+        )
+        .unique()
+        .join(persons.select(key, "_stop", "_event"), on=key, how="left")
+        .sort(key, "start")
+        .with_columns(
+            # The episode stops at the start of the next episode of the same
+            # individual, otherwise at the end of the follow-up
+            (col(key).shift(-1) == col(key)).fill_null(False).alias("_has_next"),
+        )
+        .select(
+            col(key),
+            col("start"),
+            when(col("_has_next"))
+            .then(col("start").shift(-1))
+            .otherwise(col("_stop"))
+            .alias("stop"),
+            when(col("_has_next"))
+            .then(lit(0, dtype=pl.Int8))
+            .otherwise(col("_event"))
+            .alias("event"),
+        )
+    )
+
+    # The covariates at the start of each episode are the last values
+    # on or before that day
+    for ch in changes:
+        episodes = episodes.join_asof(
+            ch,
+            left_on="start",
+            right_on="_day",
+            by=key,
+            strategy="backward",
+            check_sortedness=False,
+        ).drop("_day")
+
+    return episodes.with_columns(
+        pl.selectors.string().exclude(key).cast(pl.Categorical)
+    )